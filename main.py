@@ -3,32 +3,55 @@ import sys
 import os
 import sqlite3
 from datetime import datetime
-import tempfile
+from collections import namedtuple
 import shutil
+import subprocess
 import webbrowser
 import platform
+import threading
+import functools
 
 from PyQt5 import QtWidgets, QtGui, QtCore
-from PIL import Image
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+# PIL and reportlab are imported where used, so startup doesn't pay for them
 
 # --- Constants / Setup ---
 DB_FILE = "college_fee.db"
 PHOTO_DIR = "student_photos"
+PHOTO_SIZE = (256, 256)  # stored photos are downscaled to this on save
+_PLATFORM = platform.system()
+RECEIPT_DIR = "receipts"
 os.makedirs(PHOTO_DIR, exist_ok=True)
+os.makedirs(RECEIPT_DIR, exist_ok=True)
 
 # --- Database helpers ---
+# One shared connection for the whole session; autocommit mode, writes serialized by _DB_LOCK
+_CONN = sqlite3.connect(DB_FILE, check_same_thread=False, isolation_level=None)
+_DB_LOCK = threading.Lock()
+
+# Statements reused verbatim so sqlite3's statement cache can hit
+# Upsert rather than REPLACE so an edit keeps the student's running total_paid
+_SQL_INSERT_STUDENT = ("INSERT INTO students (student_id, name, class, total_fee, photo_path) VALUES (?,?,?,?,?) "
+                       "ON CONFLICT(student_id) DO UPDATE SET name=excluded.name, class=excluded.class, "
+                       "total_fee=excluded.total_fee, photo_path=excluded.photo_path")
+_SQL_INSERT_PAYMENT = "INSERT INTO payments (student_id, amount_paid, payment_date, mode_of_payment) VALUES (?,?,?,?)"
+_SQL_ADD_TOTAL_PAID = "UPDATE students SET total_paid = total_paid + ? WHERE student_id=?"
+
 def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = _CONN.cursor()
+    # WAL + NORMAL sync: one fsync per commit instead of two with the default rollback journal
+    c.execute("PRAGMA journal_mode=WAL")
+    c.execute("PRAGMA synchronous=NORMAL")
+    c.execute("PRAGMA temp_store=MEMORY")
+    c.execute("PRAGMA cache_size=-20000")
+    c.execute("PRAGMA foreign_keys=ON")
     c.execute('''
         CREATE TABLE IF NOT EXISTS students (
             student_id TEXT PRIMARY KEY,
             name TEXT NOT NULL,
             class TEXT,
             total_fee REAL NOT NULL,
-            photo_path TEXT
+            photo_path TEXT,
+            total_paid REAL DEFAULT 0
         )
     ''')
     c.execute('''
@@ -41,189 +64,244 @@ def init_db():
             FOREIGN KEY(student_id) REFERENCES students(student_id)
         )
     ''')
-    conn.commit()
-    conn.close()
+    # Older databases lack the running total; add it and backfill from payments
+    cols = [row[1] for row in c.execute("PRAGMA table_info(students)")]
+    if "total_paid" not in cols:
+        c.execute("ALTER TABLE students ADD COLUMN total_paid REAL DEFAULT 0")
+        c.execute("UPDATE students SET total_paid = COALESCE((SELECT SUM(amount_paid) FROM payments WHERE payments.student_id=students.student_id), 0)")
+    # Covers both the student_id filters and the "latest receipt" ORDER BY
+    c.execute("CREATE INDEX IF NOT EXISTS idx_payments_sid_rno ON payments(student_id, receipt_no DESC)")
 
 def add_student_db(student_id, name, student_class, total_fee, photo_path):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO students (student_id, name, class, total_fee, photo_path) VALUES (?,?,?,?,?)",
-              (student_id, name, student_class, total_fee, photo_path))
-    conn.commit()
-    conn.close()
-
-def get_student(student_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT student_id, name, class, total_fee, photo_path FROM students WHERE student_id=?", (student_id,))
-    row = c.fetchone()
-    conn.close()
-    return row
-
-def add_payment_db(student_id, amount_paid, payment_date, mode):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("INSERT INTO payments (student_id, amount_paid, payment_date, mode_of_payment) VALUES (?,?,?,?)",
-              (student_id, amount_paid, payment_date, mode))
-    conn.commit()
-    receipt_no = c.lastrowid
-    conn.close()
-    return receipt_no
-
-def get_last_payment(student_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT receipt_no, student_id, amount_paid, payment_date, mode_of_payment FROM payments WHERE student_id=? ORDER BY receipt_no DESC LIMIT 1", (student_id,))
-    row = c.fetchone()
-    conn.close()
-    return row
-
-def get_total_paid(student_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT SUM(amount_paid) FROM payments WHERE student_id=?", (student_id,))
-    row = c.fetchone()
-    conn.close()
-    return row[0] or 0.0
-
-def get_total_due(student_id):
-    # Get total paid
-    total_paid = get_total_paid(student_id) or 0.0
-
-    # Get total fee
-    with sqlite3.connect(DB_FILE) as conn:
-        c = conn.cursor()
-        c.execute("SELECT total_fee FROM students WHERE student_id=?", (student_id,))
-        result = c.fetchone()
-        if result is None:
-            return None  # student not found
-        total_fee = result[0]
-
-    total_due = total_fee - total_paid
-    return total_due
+    with _DB_LOCK:
+        c = _CONN.cursor()
+        c.execute(_SQL_INSERT_STUDENT, (student_id, name, student_class, total_fee, photo_path))
+        get_student_with_paid.cache_clear()
+
+def add_students_bulk(rows):
+    """rows: iterable of (student_id, name, class, total_fee, photo_path)"""
+    with _DB_LOCK:
+        c = _CONN.cursor()
+        c.execute("BEGIN")
+        try:
+            c.executemany(_SQL_INSERT_STUDENT, rows)
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+        get_student_with_paid.cache_clear()
+
+@functools.lru_cache(maxsize=256)
+def get_student_with_paid(student_id):
+    # Student row plus total paid in a single round-trip; cached until the next student/payment write
+    c = _CONN.cursor()
+    c.execute("SELECT student_id, name, class, total_fee, photo_path, COALESCE(total_paid, 0) FROM students WHERE student_id=?",
+              (student_id,))
+    return c.fetchone()
+
+def record_payment_atomic(student_id, amount_paid, payment_date, mode):
+    """
+    Validate, insert a payment and update the running total in one transaction.
+    Returns a dict with everything the receipt needs, or None if the student is not found.
+    Raises ValueError if the amount exceeds the remaining fee.
+    """
+    with _DB_LOCK:
+        c = _CONN.cursor()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            c.execute("SELECT name, class, total_fee, COALESCE(total_paid, 0), photo_path FROM students WHERE student_id=?",
+                      (student_id,))
+            row = c.fetchone()
+            if row is None or amount_paid > row[2] - row[3]:
+                # nothing to write; errors are reported once the transaction is closed
+                c.execute("ROLLBACK")
+            else:
+                c.execute(_SQL_INSERT_PAYMENT, (student_id, amount_paid, payment_date, mode))
+                receipt_no = c.lastrowid
+                c.execute(_SQL_ADD_TOTAL_PAID, (amount_paid, student_id))
+                c.execute("COMMIT")
+                get_student_with_paid.cache_clear()
+        except Exception:
+            if _CONN.in_transaction:
+                c.execute("ROLLBACK")
+            raise
+    if row is None:
+        return None
+    name, sclass, total_fee, total_paid, photo_path = row
+    remaining_fee = total_fee - total_paid
+    if amount_paid > remaining_fee:
+        raise ValueError(f"Payment exceeds remaining fee of ₹{remaining_fee:.2f}.")
+    return {
+        "receipt_no": receipt_no,
+        "student_id": student_id,
+        "name": name,
+        "class": sclass,
+        "photo_path": photo_path,
+        "amount_paid": amount_paid,
+        "payment_date": payment_date,
+        "mode": mode,
+        "total_fee": total_fee,
+        "total_paid": total_paid + amount_paid,
+    }
 
 
 # --- Utility to open PDF cross-platform ---
 def open_file(path):
     try:
-        if platform.system() == "Windows":
+        if _PLATFORM == "Windows":
             os.startfile(path)
-        elif platform.system() == "Darwin":
-            subprocess_call = ["open", path]
-            os.system(" ".join(subprocess_call))
         else:
-            # linux/unix
-            os.system(f"xdg-open \"{path}\"")
-    except Exception:
-        # fallback to webbrowser
+            # "open" on macOS, xdg-open on linux/unix; no shell, don't wait for the viewer
+            opener = "open" if _PLATFORM == "Darwin" else "xdg-open"
+            subprocess.Popen([opener, path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                             start_new_session=True)
+    except OSError:
+        # opener missing; fallback to webbrowser
         webbrowser.open_new(path)
 
 # --- Receipt PDF generator ---
-def generate_receipt_pdf(student_id, receipt_no, student, payment):
+# --- Receipt layout ---
+# Every coordinate on the receipt is fixed for A4, so it is worked out once on first use
+ReceiptLayout = namedtuple("ReceiptLayout", [
+    "pagesize", "margin_x", "header_rect", "title_xy", "detail_ys",
+    "photo_rect", "header_cells", "value_cells", "summary_ys",
+])
+
+RECEIPT_COLS = ["Receipt No", "Amount Paid (Rs.)", "Date", "Mode of Payment"]
+
+def _make_layout(pagesize):
+    width, height = pagesize
+    margin_x = 20
+    y = height - 35
+    header_height = 30
+
+    # Student photo on top-right
+    photo_w = 110
+    photo_h = 110
+
+    # Table settings
+    table_top = y - 160
+    row_height = 25
+    col_widths = [120, 140, 120, 120]  # widths of columns
+
+    # (x, y, w, h) of each cell, plus the centred text anchor
+    header_cells = []
+    value_cells = []
+    x = margin_x
+    for w in col_widths:
+        header_cells.append((x, table_top - row_height, w, row_height, x + w/2, table_top - row_height + 7))
+        value_cells.append((x, table_top - 2*row_height, w, row_height, x + w/2, table_top - 2*row_height + 7))
+        x += w
+
+    # Bottom summary: total fee, total paid, remaining, printed on
+    bottom_y = table_top - 80
+    return ReceiptLayout(
+        pagesize=pagesize,
+        margin_x=margin_x,
+        header_rect=(0, y - header_height + 10, width, header_height),
+        title_xy=(width/2, y - 12),
+        detail_ys=(y - header_height - 20, y - header_height - 37, y - header_height - 54),
+        photo_rect=(width - margin_x - photo_w, y - photo_h - 25, photo_w, photo_h),
+        header_cells=header_cells,
+        value_cells=value_cells,
+        summary_ys=(bottom_y, bottom_y - 20, bottom_y - 40, bottom_y - 60),
+    )
+
+@functools.lru_cache(maxsize=None)
+def _receipt_layout():
+    from reportlab.lib.pagesizes import A4
+    return _make_layout(A4)
+
+def generate_receipt_pdf(receipt):
     """
-    student: tuple(student_id, name, class, total_fee, photo_path)
-    payment: tuple(receipt_no, student_id, amount_paid, payment_date, mode)
+    receipt: dict as returned by record_payment_atomic; its payment_date is also
+             used as the "Receipt Generated" timestamp
     """
     # Prepare data
-    sid, name, sclass, total_fee, photo_path = student
-    receipt_no, _, amount_paid, payment_date, mode = payment
-    total_paid = get_total_paid(student_id)
+    sid, name, sclass, photo_path = receipt["student_id"], receipt["name"], receipt["class"], receipt["photo_path"]
+    receipt_no, amount_paid, payment_date, mode = receipt["receipt_no"], receipt["amount_paid"], receipt["payment_date"], receipt["mode"]
+    total_fee, total_paid = receipt["total_fee"], receipt["total_paid"]
     remaining = float(total_fee) - float(total_paid)
 
-    RECEIPT_DIR = "receipts"
-    os.makedirs(RECEIPT_DIR, exist_ok=True)
     # File name
-    safe_name = "".join(ch for ch in name if ch.isalnum() or ch in (" ", "_")).strip().replace(" ", "_")
-    pdf_filename = os.path.join(RECEIPT_DIR, f"Receipt_{sid}_{receipt_no}.pdf")    # Create PDF
-    width, height = A4
-    c = canvas.Canvas(pdf_filename, pagesize=A4)
+    pdf_filename = os.path.join(RECEIPT_DIR, f"Receipt_{sid}_{receipt_no}.pdf")
+    from reportlab.pdfgen import canvas
 
-    margin_x = 20
-    y = height - 35
-# Colored header first
+    L = _receipt_layout()
+    c = canvas.Canvas(pdf_filename, pagesize=L.pagesize)
+
+    # Colored header first
     c.setFillColorRGB(0.2, 0.5, 0.9)  # blue
-    header_height = 30
-    c.rect(0, y - header_height + 10, width, header_height, fill=1)
+    c.rect(*L.header_rect, fill=1)
 
-# Title text in white
+    # Title text in white
     c.setFillColorRGB(1, 1, 1)
     c.setFont("Helvetica-Bold", 18)
-    c.drawCentredString(width/2, y - 12, "FEE RECEIPT")
+    c.drawCentredString(*L.title_xy, "FEE RECEIPT")
 
-# Reset text color to black
+    # Reset text color to black for rest
     c.setFillColorRGB(0, 0, 0)
 
-# Now draw student details
+    # Now draw student details
     c.setFont("Helvetica-Bold", 12)
-    c.drawString(margin_x, y - header_height - 20, f"Student Name: {name}")
-    c.drawString(margin_x, y - header_height - 37, f"Student ID: {sid}")
-    c.drawString(margin_x, y - header_height - 54, f"Class: {sclass}")
-
-# Reset text color to black for rest
-    c.setFillColorRGB(0, 0, 0)
-
-    # Student photo on top-right (resize to fit)
-    photo_w = 110
-    photo_h = 110
-    photo_x = width - margin_x - photo_w
-    photo_y = y - photo_h - 25
+    name_y, sid_y, class_y = L.detail_ys
+    c.drawString(L.margin_x, name_y, f"Student Name: {name}")
+    c.drawString(L.margin_x, sid_y, f"Student ID: {sid}")
+    c.drawString(L.margin_x, class_y, f"Class: {sclass}")
 
     if photo_path and os.path.exists(photo_path):
         try:
-            # Resize the image to fit nicely (use a temp file)
-            im = Image.open(photo_path)
-            im.thumbnail((photo_w, photo_h))
-            tf = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-            im.save(tf.name, format="PNG")
-            tf.close()
-            c.drawImage(tf.name, photo_x, photo_y, width=photo_w, height=photo_h)
-            os.unlink(tf.name)
+            # Photo is already downscaled in save_student; given a path, reportlab
+            # embeds a JPEG as-is without decoding it
+            photo_x, photo_y, photo_w, photo_h = L.photo_rect
+            c.drawImage(photo_path, photo_x, photo_y, width=photo_w, height=photo_h,
+                        preserveAspectRatio=True, mask='auto')
         except Exception:
             pass
 
-   # Table settings
-    table_top = y - 160
-    row_height = 25
-    col_widths = [120, 140, 120, 120]  # widths of columns
-    cols = ["Receipt No", "Amount Paid (Rs.)", "Date", "Mode of Payment"]
-
-# Draw table header with black border
+    # Draw table header with black border
     c.setFont("Helvetica-Bold", 12)
-    x = margin_x
-    for i, col in enumerate(cols):
-        w = col_widths[i]
-        c.rect(x, table_top - row_height, w, row_height, fill=0)  # draw cell
-        c.drawCentredString(x + w/2, table_top - row_height + 7, col)  # centered text
-        x += w
+    for (x, y, w, h, tx, ty), col in zip(L.header_cells, RECEIPT_COLS):
+        c.rect(x, y, w, h, fill=0)  # draw cell
+        c.drawCentredString(tx, ty, col)  # centered text
 
-# Draw the payment values row
+    # Draw the payment values row
     c.setFont("Helvetica", 12)
-    x  = margin_x
     row_values = [str(receipt_no), f"{amount_paid:.2f}", str(payment_date), str(mode)]
-    for i, val in enumerate(row_values):
-        w = col_widths[i]
-        c.rect(x, table_top - 2*row_height, w, row_height, fill=0)  # draw cell
-        c.drawCentredString(x + w/2, table_top - 2*row_height + 7, val)
-        x += w
+    for (x, y, w, h, tx, ty), val in zip(L.value_cells, row_values):
+        c.rect(x, y, w, h, fill=0)  # draw cell
+        c.drawCentredString(tx, ty, val)
 
     # Bottom summary: total fee, total paid, remaining, printed on
-    bottom_y = table_top - 80
+    fee_y, paid_y, remain_y, printed_y = L.summary_ys
     c.setFont("Helvetica-Bold", 12)
-    c.drawString(margin_x, bottom_y, f"Total Fee: Rs. {float(total_fee):.2f}")
-    c.drawString(margin_x, bottom_y - 20, f"Total Paid: Rs. {float(total_paid):.2f}")
-    c.drawString(margin_x, bottom_y - 40, f"Remaining Fee Due: Rs. {float(remaining):.2f}")
-    c.drawString(margin_x, bottom_y - 60, f"Receipt Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-
-    # Optional signature line
-   # c.line(width - 220, bottom_y - 60, width - 40, bottom_y - 60)
-    #c.setFont("Helvetica", 10)
-    #c.drawString(width - 210, bottom_y - 75, "Authorized Signatory")
+    c.drawString(L.margin_x, fee_y, f"Total Fee: Rs. {float(total_fee):.2f}")
+    c.drawString(L.margin_x, paid_y, f"Total Paid: Rs. {float(total_paid):.2f}")
+    c.drawString(L.margin_x, remain_y, f"Remaining Fee Due: Rs. {float(remaining):.2f}")
+    c.drawString(L.margin_x, printed_y, f"Receipt Generated: {payment_date}")
 
     c.showPage()
     c.save()
     return pdf_filename
 
 # --- PyQt5 GUI ---
+class ReceiptWorker(QtCore.QThread):
+    """Builds a receipt PDF off the GUI thread."""
+    finished_path = QtCore.pyqtSignal(str)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, receipt, parent=None):
+        super().__init__(parent)
+        self.receipt = receipt
+
+    def run(self):
+        try:
+            pdf_file = generate_receipt_pdf(self.receipt)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished_path.emit(pdf_file)
+
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
@@ -249,6 +327,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.init_record_payment_tab()
         self.init_view_tab()
 
+        self._receipt_workers = []
+
     # --- Add student tab ---
     def init_add_student_tab(self):
         layout = QtWidgets.QFormLayout(self.tab_add_student)
@@ -285,9 +365,15 @@ class MainWindow(QtWidgets.QMainWindow):
     def browse_photo(self):
         path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Select Student Photo", "", "Images (*.png *.jpg *.jpeg *.bmp)")
         if path:
-            # show preview
-            pix = QtGui.QPixmap(path)
-            pix = pix.scaled(self.photo_label.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+            # show preview; let the codec decode straight to label size instead of full resolution
+            reader = QtGui.QImageReader(path)
+            size = reader.size()
+            if size.isValid():
+                reader.setScaledSize(size.scaled(self.photo_label.size(), QtCore.Qt.KeepAspectRatio))
+                pix = QtGui.QPixmap.fromImage(reader.read())
+            else:
+                pix = QtGui.QPixmap(path)
+                pix = pix.scaled(self.photo_label.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
             self.photo_label.setPixmap(pix)
             # copy file to photo dir with standardized name
             self.photo_path_temp = path
@@ -307,16 +393,25 @@ class MainWindow(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Validation", "Provide a valid numeric Total Fee.")
             return
 
-        # Save/copy photo into PHOTO_DIR named by student id
+        # Save a receipt-sized copy of the photo into PHOTO_DIR named by student id,
+        # so receipts can draw it directly without re-decoding the original
         photo_dest = None
         if getattr(self, "photo_path", None):
-            ext = os.path.splitext(self.photo_path)[1]
-            photo_dest = os.path.join(PHOTO_DIR, f"{sid}{ext}")
+            photo_dest = os.path.join(PHOTO_DIR, f"{sid}.jpg")
             try:
-                shutil.copy2(self.photo_path, photo_dest)
-            except Exception as e:
-                QtWidgets.QMessageBox.warning(self, "Photo Error", f"Could not copy photo: {e}")
-                photo_dest = None
+                from PIL import Image
+                im = Image.open(self.photo_path)
+                im.thumbnail(PHOTO_SIZE)
+                im.convert("RGB").save(photo_dest, format="JPEG", quality=80)
+            except Exception:
+                # PIL could not handle it; keep the original file as before
+                ext = os.path.splitext(self.photo_path)[1]
+                photo_dest = os.path.join(PHOTO_DIR, f"{sid}{ext}")
+                try:
+                    shutil.copy2(self.photo_path, photo_dest)
+                except Exception as e:
+                    QtWidgets.QMessageBox.warning(self, "Photo Error", f"Could not copy photo: {e}")
+                    photo_dest = None
 
         add_student_db(sid, name, sclass, total_fee, photo_dest)
         QtWidgets.QMessageBox.information(self, "Saved", f"Student {name} ({sid}) saved.")
@@ -356,12 +451,12 @@ class MainWindow(QtWidgets.QMainWindow):
         if not sid:
             QtWidgets.QMessageBox.warning(self, "Input", "Enter Student ID.")
             return
-        student = get_student(sid)
-        if not student:
+        row = get_student_with_paid(sid)
+        if not row:
             QtWidgets.QMessageBox.warning(self, "Not found", "Student not found in database.")
             return
+        student, total_paid = row[:5], row[5]
         sid, name, sclass, total_fee, photo_path = student
-        total_paid = get_total_paid(sid)
         remain = float(total_fee) - float(total_paid)
         self.current_student = student
         self.p_student_info.setText(f"Name: {name}\nClass: {sclass}\nTotal Fee: ₹{total_fee:.2f}\nTotal Paid: ₹{total_paid:.2f}\nRemaining: ₹{remain:.2f}")
@@ -380,29 +475,45 @@ class MainWindow(QtWidgets.QMainWindow):
         except:
             QtWidgets.QMessageBox.warning(self, "Input", "Enter numeric amount.")
             return
-        remaining_fee = get_total_due(sid)
-        if amt > remaining_fee:
-            QtWidgets.QMessageBox.warning(
-            self, 
-            "Invalid Payment", 
-            f"Payment exceeds remaining fee of ₹{remaining_fee:.2f}."
-            )
-            return
         mode = self.p_mode.currentText()
         payment_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # insert payment
-        receipt_no = add_payment_db(sid, amt, payment_date, mode)
-        payment = get_last_payment(sid)
-        pdf_file = generate_receipt_pdf(sid, receipt_no, self.current_student, payment)
-        QtWidgets.QMessageBox.information(self, "Success", f"Payment recorded. Receipt: {pdf_file}")
-        # auto-open pdf
-        open_file(os.path.abspath(pdf_file))
+        # validate + insert payment in one transaction
+        try:
+            receipt = record_payment_atomic(sid, amt, payment_date, mode)
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Invalid Payment", str(e))
+            return
+        if receipt is None:
+            QtWidgets.QMessageBox.warning(self, "Not found", "Student not found in database.")
+            return
+        # build the PDF in the background; keep a reference until the thread is done
+        worker = ReceiptWorker(receipt, self)
+        worker.finished_path.connect(self._on_receipt_ready)
+        worker.failed.connect(self._on_receipt_failed)
+        worker.finished.connect(lambda: self._receipt_workers.remove(worker))
+        worker.finished.connect(worker.deleteLater)
+        self._receipt_workers.append(worker)
+        worker.start()
         # clear payment inputs
         self.p_amount.clear()
         self.p_student_info.setText("Student info will appear here.")
         self.p_sid.clear()
         self.current_student = None
 
+    def _on_receipt_ready(self, pdf_file):
+        QtWidgets.QMessageBox.information(self, "Success", f"Payment recorded. Receipt: {pdf_file}")
+        # auto-open pdf
+        open_file(os.path.abspath(pdf_file))
+
+    def _on_receipt_failed(self, error):
+        QtWidgets.QMessageBox.warning(self, "Receipt Error", f"Payment recorded, but the receipt could not be generated: {error}")
+
+    def closeEvent(self, event):
+        # let in-flight receipts finish; destroying a running QThread aborts the app
+        for worker in list(self._receipt_workers):
+            worker.wait()
+        super().closeEvent(event)
+
     # --- View / Search tab ---
     def init_view_tab(self):
         layout = QtWidgets.QVBoxLayout(self.tab_view)
@@ -420,8 +531,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # Table of payments
         self.payments_table = QtWidgets.QTableWidget()
-        self.payments_table.setColumnCount(5)
-        self.payments_table.setHorizontalHeaderLabels(["Receipt No", "Student ID", "Amount", "Date", "Mode"])
+        self.payments_table.setColumnCount(4)
+        self.payments_table.setHorizontalHeaderLabels(["Receipt No", "Amount", "Date", "Mode"])
         self.payments_table.horizontalHeader().setStretchLastSection(True)
         layout.addWidget(self.payments_table)
 
@@ -430,27 +541,35 @@ class MainWindow(QtWidgets.QMainWindow):
         if not sid:
             QtWidgets.QMessageBox.warning(self, "Input", "Enter Student ID to search.")
             return
-        student = get_student(sid)
-        if not student:
+        row = get_student_with_paid(sid)
+        if not row:
             QtWidgets.QMessageBox.information(self, "Not Found", "No student found.")
             return
-        sid, name, sclass, total_fee, photo_path = student
-        total_paid = get_total_paid(sid)
+        sid, name, sclass, total_fee, photo_path, total_paid = row
         remain = float(total_fee) - float(total_paid)
         info = f"Name: {name}\nStudent ID: {sid}\nClass: {sclass}\nTotal Fee: ₹{total_fee:.2f}\nTotal Paid: ₹{total_paid:.2f}\nRemaining: ₹{remain:.2f}\nPhoto Path: {photo_path}\n"
         self.search_result.setPlainText(info)
 
         # populate payments table
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT receipt_no, student_id, amount_paid, payment_date, mode_of_payment FROM payments WHERE student_id=? ORDER BY receipt_no DESC", (sid,))
+        c = _CONN.cursor()
+        c.execute("SELECT receipt_no, amount_paid, payment_date, mode_of_payment FROM payments WHERE student_id=? ORDER BY receipt_no DESC", (sid,))
         rows = c.fetchall()
-        conn.close()
-        self.payments_table.setRowCount(len(rows))
-        for r, row in enumerate(rows):
-            for col, val in enumerate(row):
-                item = QtWidgets.QTableWidgetItem(str(val))
-                self.payments_table.setItem(r, col, item)
+        # fill with repaints/sorting/signals suspended so the table redraws once, not per cell
+        table = self.payments_table
+        sorting = table.isSortingEnabled()
+        table.setUpdatesEnabled(False)
+        table.setSortingEnabled(False)
+        table.blockSignals(True)
+        try:
+            table.clearContents()
+            table.setRowCount(len(rows))
+            for r, row in enumerate(rows):
+                for col, val in enumerate(row):
+                    table.setItem(r, col, QtWidgets.QTableWidgetItem(str(val)))
+        finally:
+            table.blockSignals(False)
+            table.setSortingEnabled(sorting)
+            table.setUpdatesEnabled(True)
 
 # --- main ---
 def main():